@@ -1,3 +1,4 @@
+from restaurant.menu import models
 from restaurant.menu.database import SQLALCHEMY_DATABASE_URL
 
 from logging.config import fileConfig
@@ -22,7 +23,7 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-target_metadata = None
+target_metadata = models.Base.metadata
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
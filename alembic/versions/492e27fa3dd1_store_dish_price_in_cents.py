@@ -0,0 +1,28 @@
+"""store dish price in cents
+
+Revision ID: 492e27fa3dd1
+Revises: 903135a36cba
+Create Date: 2026-10-15 21:46:42.346807
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '492e27fa3dd1'
+down_revision: Union[str, None] = '903135a36cba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('dishes', 'price', type_=sa.BigInteger(), existing_nullable=True,
+                    postgresql_using='round(price * 100)::bigint')
+
+
+def downgrade() -> None:
+    op.alter_column('dishes', 'price', type_=sa.Numeric(10, 2), existing_nullable=True,
+                    postgresql_using='price / 100.0')
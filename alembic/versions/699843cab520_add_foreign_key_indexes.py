@@ -0,0 +1,38 @@
+"""add foreign key indexes
+
+Revision ID: 699843cab520
+Revises: f1d8e43c229c
+Create Date: 2026-10-15 21:42:02.070256
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '699843cab520'
+down_revision: Union[str, None] = 'f1d8e43c229c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a database without the tables gets these indexes together with the tables
+    if not sa.inspect(op.get_bind()).has_table('submenus'):
+        return
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_submenus_menu_id', 'submenus', ['menu_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_dishes_submenu_id', 'dishes', ['submenu_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_dishes_submenu_id', table_name='dishes',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_submenus_menu_id', table_name='submenus',
+                      postgresql_concurrently=True, if_exists=True)
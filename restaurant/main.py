@@ -1,13 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
-from .menu import models
-from .menu.database import engine
+from .menu.cache import redis
+from .menu.database import engine, warm_up_pool
 from .menu.routers import menu_router
 
-models.Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up_pool()
+    yield
+    if redis is not None:
+        await redis.aclose()
+    await engine.dispose()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.include_router(
     menu_router,
@@ -0,0 +1,68 @@
+import functools
+import json
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import REDIS_HOST, REDIS_PORT
+
+# Caching is switched off when no Redis host is configured
+redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT) if REDIS_HOST else None
+
+
+def _version_key(namespace: str) -> str:
+    return f'{namespace}:version'
+
+
+def _make_key(namespace: str, version: int, func, kwargs: dict) -> str:
+    params = ':'.join(f'{key}={value}' for key, value in sorted(kwargs.items())
+                      if not isinstance(value, AsyncSession))
+    return f'{namespace}:{version}:{func.__name__}:{params}'
+
+
+def _encode(result):
+    if isinstance(result, list):
+        return [_encode(item) for item in result]
+    if hasattr(result, '_mapping'):
+        result = result._mapping
+    return jsonable_encoder(result, custom_encoder={Decimal: str})
+
+
+def cache(namespace: str, ttl: int = 300):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if redis is None:
+                return await func(*args, **kwargs)
+            try:
+                # a fill that started before an invalidation lands under the old version, where nobody reads it
+                version = int(await redis.get(_version_key(namespace)) or 0)
+                key = _make_key(namespace, version, func, kwargs)
+                cached = await redis.get(key)
+            except RedisError:
+                return await func(*args, **kwargs)
+            if cached is not None:
+                return json.loads(cached)
+            result = await func(*args, **kwargs)
+            try:
+                await redis.set(key, json.dumps(_encode(result)), ex=ttl)
+            except RedisError:
+                pass
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def clear_cache(namespace: str):
+    if redis is None:
+        return
+    try:
+        # entries of the previous versions are left to expire with their ttl
+        await redis.incr(_version_key(namespace))
+    except RedisError:
+        pass
@@ -10,3 +10,5 @@ DB_PORT = os.environ.get("DB_PORT")
 DB_USER = os.environ.get("DB_USERNAME")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 DB_BASE = os.environ.get("DATABASE")
+REDIS_HOST = os.environ.get("REDIS_HOST")
+REDIS_PORT = os.environ.get("REDIS_PORT", 6379)
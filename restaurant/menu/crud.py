@@ -1,247 +1,255 @@
+from decimal import Decimal, ROUND_HALF_UP
 from uuid import UUID
 
 from fastapi import HTTPException
-from psycopg2 import errors
-from sqlalchemy import select, func, and_
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, exists, func, and_, cast, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models, schemas
 
-
-def raise_if_not_exist(item: object, message: str, status_code=404):
-    if not item:
-        raise HTTPException(status_code=status_code, detail=message)
-
-
-def is_valid_uuid(uuid_to_test, version=4):
-    try:
-        uuid_obj = UUID(uuid_to_test, version=version)
-    except ValueError:
-        return False
-    return str(uuid_obj) == uuid_to_test
-
-
-def get_submenus(db: Session, menu_id: UUID):
-    submenus = db.query(models.SubMenu.id,
-                        models.SubMenu.title,
-                        models.SubMenu.description,
-                        (
-                            select(func.count(models.Dish.id))
-                            .where(models.SubMenu.id == models.Dish.submenu_id)
-                            .scalar_subquery().label('dishes_count')
-                        )
-                        ).filter(models.SubMenu.menu_id == menu_id)
-    return submenus.all()
-
-
-def get_submenu_by_id(db: Session, menu_id: UUID, submenu_id: UUID):
-    submenus = db.query(models.SubMenu.id,
-                        models.SubMenu.title,
-                        models.SubMenu.description,
-                        (
-                            select(func.count(models.Dish.id))
-                            .where(models.SubMenu.id == models.Dish.submenu_id)
-                            .scalar_subquery().label('dishes_count')
-                        )
-                        ).filter(and_(models.SubMenu.menu_id == menu_id, models.SubMenu.id == submenu_id))
-    return submenus.first()
-
-
-def get_submenu_by_title(db: Session, title: str):
-    return db.query(models.SubMenu).filter(models.SubMenu.title == title).first()
-
-
-def create_submenu(db: Session, menu_id: UUID, submenu: schemas.MenuBase):
-    if is_valid_uuid(menu_id):
-        db_submenu = models.SubMenu()
-        submenu_data = submenu.model_dump(exclude_unset=True)
-        for key, value in submenu_data.items():
-            setattr(db_submenu, key, value)
-        db_submenu.menu_id = menu_id
-        db.add(db_submenu)
-        db.commit()
-        db.refresh(db_submenu)
-        return get_submenu_by_id(db=db, menu_id=menu_id, submenu_id=db_submenu.id)
-    else:
-        raise HTTPException(status_code=422, detail="Wrong id type")
-
-
-def get_menus(db: Session):
-    menus = (db.query(
-        models.Menu.id,
-        models.Menu.title,
-        models.Menu.description,
-        func.count(models.SubMenu.id).label('submenus_count'),
-        (
-            select(func.coalesce(func.count(models.Dish.id), 0))
-            .where(models.SubMenu.id == models.Dish.submenu_id)
-            .scalar_subquery()
-        ).label('dishes_count')
-    ).join(models.SubMenu, isouter=True)
-             .group_by(models.Menu.id, models.Menu.title, models.Menu.description, 'dishes_count'))
-
-    return menus.all()
+CENT = Decimal('0.01')
 
 
-def get_menu_by_id(db: Session, menu_id: UUID):
-    menus = (db.query(
+def dish_values(dish: schemas.DishCreate) -> dict:
+    dish_data = dish.model_dump(exclude_unset=True)
+    if 'price' in dish_data:
+        # prices are stored as whole cents, rounded half away from zero as the former numeric(10, 2) column did
+        dish_data['price'] = int(dish_data['price'].quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+    return dish_data
+
+
+async def check_hierarchy(db: AsyncSession, menu_id: UUID, submenu_id: UUID = None, dish_id: UUID = None):
+    # one row of existence flags, in menu, submenu, dish order
+    checks = [exists().where(models.Menu.id == menu_id)]
+    if submenu_id is not None:
+        checks.append(exists().where(and_(models.SubMenu.id == submenu_id, models.SubMenu.menu_id == menu_id)))
+    if dish_id is not None:
+        checks.append(exists().where(and_(models.Dish.id == dish_id, models.Dish.submenu_id == submenu_id)))
+    return (await db.execute(select(*checks))).one()
+
+
+async def get_submenus(db: AsyncSession, menu_id: UUID):
+    submenus = select(models.SubMenu.id,
+                      models.SubMenu.title,
+                      models.SubMenu.description,
+                      (
+                          select(func.count(models.Dish.id))
+                          .where(models.SubMenu.id == models.Dish.submenu_id)
+                          .scalar_subquery().label('dishes_count')
+                      )
+                      ).where(models.SubMenu.menu_id == menu_id)
+    return (await db.execute(submenus)).all()
+
+
+async def get_submenu_by_id(db: AsyncSession, menu_id: UUID, submenu_id: UUID):
+    submenus = select(models.SubMenu.id,
+                      models.SubMenu.title,
+                      models.SubMenu.description,
+                      (
+                          select(func.count(models.Dish.id))
+                          .where(models.SubMenu.id == models.Dish.submenu_id)
+                          .scalar_subquery().label('dishes_count')
+                      )
+                      ).where(and_(models.SubMenu.menu_id == menu_id, models.SubMenu.id == submenu_id))
+    return (await db.execute(submenus)).first()
+
+
+async def create_submenu(db: AsyncSession, menu_id: UUID, submenu: schemas.MenuBase):
+    submenu_data = submenu.model_dump(exclude_unset=True)
+    stmt = (insert(models.SubMenu)
+            .values(**submenu_data, menu_id=menu_id)
+            .on_conflict_do_nothing(index_elements=['title'])
+            .returning(models.SubMenu.id, models.SubMenu.title, models.SubMenu.description))
+    db_submenu = (await db.execute(stmt)).first()
+    if db_submenu is None:
+        raise HTTPException(status_code=400, detail="Title of Submenu already registered")
+    await db.commit()
+    # a freshly inserted submenu has no dishes yet
+    return {**db_submenu._mapping, 'dishes_count': 0}
+
+
+def menus_with_counts_query():
+    dish_counts = (select(models.Dish.submenu_id, func.count(models.Dish.id).label('dishes_count'))
+                   .group_by(models.Dish.submenu_id)
+                   .cte('dish_counts'))
+    return (select(
         models.Menu.id,
         models.Menu.title,
         models.Menu.description,
         func.count(models.SubMenu.id).label('submenus_count'),
-        (
-            select(func.count(models.Dish.id))
-            .where(models.SubMenu.id == models.Dish.submenu_id)
-            .scalar_subquery()
-        ).label('dishes_count')
-    ).filter(models.Menu.id == menu_id)
-             .join(models.SubMenu, isouter=True)
-             .group_by(models.Menu.id, models.Menu.title, models.Menu.description, 'dishes_count'))
+        cast(func.coalesce(func.sum(dish_counts.c.dishes_count), 0), Integer).label('dishes_count')
+    ).select_from(models.Menu)
+            .outerjoin(models.SubMenu, models.SubMenu.menu_id == models.Menu.id)
+            .outerjoin(dish_counts, dish_counts.c.submenu_id == models.SubMenu.id)
+            .group_by(models.Menu.id))
+
 
-    return menus.first()
+def menu_counts():
+    # counts for the outer menu row only, so single-menu reads do not aggregate the whole dishes table
+    submenus_count = (select(func.count(models.SubMenu.id))
+                      .where(models.SubMenu.menu_id == models.Menu.id)
+                      .scalar_subquery())
+    dishes_count = (select(func.count(models.Dish.id))
+                    .join(models.SubMenu)
+                    .where(models.SubMenu.menu_id == models.Menu.id)
+                    .scalar_subquery())
+    return submenus_count.label('submenus_count'), dishes_count.label('dishes_count')
 
 
-def get_menu_by_title(db: Session, title: str):
-    return db.query(models.Menu).filter(models.Menu.title == title).first()
+async def get_menus(db: AsyncSession):
+    menus = menus_with_counts_query()
+    return (await db.execute(menus)).all()
 
 
-def check_menu_by_id(db: Session, menu_id: UUID):
-    if is_valid_uuid(menu_id):
-        return db.query(models.Menu.id).filter(models.Menu.id == menu_id).first()
-    else:
-        raise HTTPException(status_code=422, detail="Wrong id type")
+async def get_menu_by_id(db: AsyncSession, menu_id: UUID):
+    menus = (select(models.Menu.id, models.Menu.title, models.Menu.description, *menu_counts())
+             .where(models.Menu.id == menu_id))
+    return (await db.execute(menus)).first()
 
 
-def check_submenu_by_id(db: Session, submenu_id: UUID):
-    if is_valid_uuid(submenu_id):
-        return db.query(models.SubMenu).filter(models.SubMenu.id == submenu_id).first()
-    else:
-        raise HTTPException(status_code=422, detail="Wrong id type")
+async def check_menu_by_id(db: AsyncSession, menu_id: UUID):
+    return (await db.execute(select(models.Menu.id).where(models.Menu.id == menu_id))).first()
 
 
-def create_menu(db: Session, menu: schemas.MenuBase):
-    db_menu = models.Menu()
+async def create_menu(db: AsyncSession, menu: schemas.MenuBase):
     menu_data = menu.model_dump(exclude_unset=True)
-    for key, value in menu_data.items():
-        setattr(db_menu, key, value)
-    db.add(db_menu)
-    db.commit()
-    db.refresh(db_menu)
-    return get_menu_by_id(db, menu_id=db_menu.id)
-
-
-def get_dishes(db: Session, submenu_id: UUID, menu_id: UUID):
-    dishes = (db.query(models.Dish).select_from(models.Dish).join(models.SubMenu).join(models.Menu).filter(
-        and_(models.SubMenu.id == submenu_id, models.Menu.id == menu_id))
-    )
-    return dishes.all()
-
-
-def get_dish_by_id(db: Session, submenu_id: UUID, menu_id: UUID, dish_id: UUID):
-    dishes = (db.query(models.Dish).select_from(models.Dish).where(models.Dish.id == dish_id).join(models.SubMenu).join(
-        models.Menu).filter(
-        and_(models.SubMenu.id == submenu_id, models.Menu.id == menu_id))
-    )
-    return dishes.first()
-
-
-def create_dish(db: Session, menu_id: UUID, submenu_id: UUID, dish: schemas.DishCreate):
-    if is_valid_uuid(menu_id) and is_valid_uuid(submenu_id):
-        db_dish = models.Dish()
-        dish_data = dish.model_dump(exclude_unset=True)
-        for key, value in dish_data.items():
-            setattr(db_dish, key, value)
-        db_dish.submenu_id = submenu_id
-        try:
-            db.add(db_dish)
-            db.commit()
-            db.refresh(db_dish)
-        except errors.lookup("23505"):
-            raise HTTPException(status_code=500, detail='A duplicate record already exists')
-        except IntegrityError:
-            raise HTTPException(status_code=500, detail='A duplicate record already exists')
-
-        return get_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=db_dish.id)
-    else:
-        raise HTTPException(status_code=422, detail="Wrong id type")
-
-
-def delete_menu_by_id(db: Session, menu_id: UUID):
-    if is_valid_uuid(menu_id):
-        menu = db.get(models.Menu, menu_id)
-        raise_if_not_exist(menu, "Menu not found")
-        db.delete(menu)
-        db.commit()
-    else:
-        raise HTTPException(status_code=422, detail="Wrong id type")
+    stmt = (insert(models.Menu)
+            .values(**menu_data)
+            .on_conflict_do_nothing(index_elements=['title'])
+            .returning(models.Menu.id, models.Menu.title, models.Menu.description))
+    db_menu = (await db.execute(stmt)).first()
+    if db_menu is None:
+        raise HTTPException(status_code=400, detail="Title of Menu already registered")
+    await db.commit()
+    # a freshly inserted menu has no submenus and dishes yet
+    return {**db_menu._mapping, 'submenus_count': 0, 'dishes_count': 0}
+
+
+async def get_dishes(db: AsyncSession, submenu_id: UUID, menu_id: UUID):
+    dishes = (select(models.Dish.id, models.Dish.title, models.Dish.description, models.Dish.price)
+              .join(models.SubMenu)
+              .where(and_(models.SubMenu.id == submenu_id, models.SubMenu.menu_id == menu_id))
+              )
+    return (await db.execute(dishes)).mappings().all()
+
+
+async def get_dish_by_id(db: AsyncSession, submenu_id: UUID, menu_id: UUID, dish_id: UUID):
+    dishes = (select(models.Dish.id, models.Dish.title, models.Dish.description, models.Dish.price)
+              .join(models.SubMenu)
+              .where(and_(models.Dish.id == dish_id, models.SubMenu.id == submenu_id,
+                          models.SubMenu.menu_id == menu_id))
+              )
+    return (await db.execute(dishes)).mappings().first()
+
+
+async def create_dish(db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish: schemas.DishCreate):
+    menu_exists, submenu_exists = await check_hierarchy(db, menu_id=menu_id, submenu_id=submenu_id)
+    if not menu_exists:
+        raise HTTPException(status_code=400, detail="ID of Menu not registered")
+    if not submenu_exists:
+        raise HTTPException(status_code=400, detail="ID of Submenu not registered")
+    stmt = (insert(models.Dish)
+            .values(**dish_values(dish), submenu_id=submenu_id)
+            .on_conflict_do_nothing(index_elements=['title'])
+            .returning(models.Dish.id, models.Dish.title, models.Dish.description, models.Dish.price))
+    db_dish = (await db.execute(stmt)).first()
+    if db_dish is None:
+        raise HTTPException(status_code=400, detail='A duplicate record already exists')
+    await db.commit()
+    return db_dish
+
+
+async def delete_menu_by_id(db: AsyncSession, menu_id: UUID):
+    # submenus and dishes are removed by the ON DELETE CASCADE foreign keys
+    deleted = await db.execute(delete(models.Menu).where(models.Menu.id == menu_id).returning(models.Menu.id))
+    if deleted.first() is None:
+        raise HTTPException(status_code=404, detail="Menu not found")
+    await db.commit()
     return {"status": True, "message": "The menu has been deleted"}
 
 
-def delete_submenu_by_id(db: Session, menu_id: UUID, submenu_id: UUID):
-    if is_valid_uuid(menu_id) and is_valid_uuid(submenu_id):
-        menu = db.get(models.Menu, menu_id)
-        raise_if_not_exist(menu, "Menu not found")
-        submenu = db.get(models.SubMenu, submenu_id)
-        db.delete(submenu)
-        db.commit()
-    else:
-        raise HTTPException(status_code=422, detail="One or more wrong types id")
+async def delete_submenu_by_id(db: AsyncSession, menu_id: UUID, submenu_id: UUID):
+    stmt = (delete(models.SubMenu)
+            .where(models.SubMenu.id == submenu_id, models.SubMenu.menu_id == menu_id)
+            .returning(models.SubMenu.id))
+    if (await db.execute(stmt)).first() is None:
+        # nothing deleted, find out which level is missing
+        menu_exists, _ = await check_hierarchy(db, menu_id=menu_id, submenu_id=submenu_id)
+        if not menu_exists:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        raise HTTPException(status_code=404, detail="Submenu not found")
+    await db.commit()
     return {"status": True, "message": "The submenu has been deleted"}
 
 
-def delete_dish_by_id(db: Session, menu_id: UUID, submenu_id: UUID, dish_id: UUID):
-    if is_valid_uuid(menu_id) and is_valid_uuid(submenu_id) and is_valid_uuid(dish_id):
-        menu = db.get(models.Menu, menu_id)
-        raise_if_not_exist(menu, "Menu not found")
-        submenu = db.get(models.SubMenu, submenu_id)
-        raise_if_not_exist(submenu, "Submenu not found")
-        dish = db.get(models.Dish, dish_id)
-        raise_if_not_exist(dish, "Dish not found")
-        db.delete(dish)
-        db.commit()
-    else:
-        raise HTTPException(status_code=422, detail="One or more wrong types id")
+async def delete_dish_by_id(db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish_id: UUID):
+    stmt = (delete(models.Dish)
+            .where(models.Dish.id == dish_id,
+                   models.Dish.submenu_id == submenu_id,
+                   models.Dish.submenu_id.in_(select(models.SubMenu.id).where(models.SubMenu.menu_id == menu_id)))
+            .returning(models.Dish.id))
+    if (await db.execute(stmt)).first() is None:
+        # nothing deleted, find out which level is missing
+        menu_exists, submenu_exists, _ = await check_hierarchy(db, menu_id=menu_id, submenu_id=submenu_id,
+                                                               dish_id=dish_id)
+        if not menu_exists:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        if not submenu_exists:
+            raise HTTPException(status_code=404, detail="Submenu not found")
+        raise HTTPException(status_code=404, detail="Dish not found")
+    await db.commit()
     return {"status": True, "message": "The dish has been deleted"}
 
 
-def update_menu(db: Session, menu_id: UUID, menu: schemas.MenuBase):
-    db_menu = db.get(models.Menu, menu_id)
-    raise_if_not_exist(menu, "Menu not found")
-    menu_data = menu.model_dump(exclude_unset=True)
-    for key, value in menu_data.items():
-        setattr(db_menu, key, value)
-    db.add(db_menu)
-    db.commit()
-    db.refresh(db_menu)
-    return get_menu_by_id(db, db_menu.id)
-
-
-def update_submenu(db: Session, menu_id: UUID, submenu_id: UUID, submenu: schemas.MenuBase):
-    db_menu = db.get(models.Menu, menu_id)
-    raise_if_not_exist(db_menu, "Menu not found")
-    db_submenu = db.get(models.SubMenu, submenu_id)
-    raise_if_not_exist(db_submenu, "Submenu not found")
-    submenu_data = submenu.model_dump(exclude_unset=True)
-    for key, value in submenu_data.items():
-        setattr(db_submenu, key, value)
-    db.add(db_submenu)
-    db.commit()
-    db.refresh(db_submenu)
-    return get_submenu_by_id(db=db, menu_id=menu_id, submenu_id=db_submenu.id)
-
-
-def update_dish(db: Session, menu_id: UUID, submenu_id: UUID, dish_id: UUID, dish: schemas.DishUpdate):
-    db_menu = db.get(models.Menu, menu_id)
-    raise_if_not_exist(db_menu, "Menu not found")
-    db_submenu = db.get(models.SubMenu, submenu_id)
-    raise_if_not_exist(db_submenu, "Submenu not found")
-    db_dish = db.get(models.Dish, dish_id)
-    raise_if_not_exist(db_dish, "Submenu not found")
-    dish_data = dish.model_dump(exclude_unset=True)
-    for key, value in dish_data.items():
-        setattr(db_dish, key, value)
-    db.add(db_dish)
-    db.commit()
-    db.refresh(db_dish)
-    return get_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=db_dish.id)
+async def update_menu(db: AsyncSession, menu_id: UUID, menu: schemas.MenuBase):
+    stmt = (update(models.Menu)
+            .where(models.Menu.id == menu_id)
+            .values(**menu.model_dump(exclude_unset=True))
+            .returning(models.Menu.id, models.Menu.title, models.Menu.description, *menu_counts()))
+    db_menu = (await db.execute(stmt)).first()
+    if db_menu is None:
+        raise HTTPException(status_code=404, detail="Menu not found")
+    await db.commit()
+    return db_menu
+
+
+async def update_submenu(db: AsyncSession, menu_id: UUID, submenu_id: UUID, submenu: schemas.MenuBase):
+    dishes_count = (select(func.count(models.Dish.id))
+                    .where(models.Dish.submenu_id == models.SubMenu.id)
+                    .scalar_subquery())
+    stmt = (update(models.SubMenu)
+            .where(models.SubMenu.id == submenu_id, models.SubMenu.menu_id == menu_id)
+            .values(**submenu.model_dump(exclude_unset=True))
+            .returning(models.SubMenu.id, models.SubMenu.title, models.SubMenu.description,
+                       dishes_count.label('dishes_count')))
+    db_submenu = (await db.execute(stmt)).first()
+    if db_submenu is None:
+        # nothing updated, find out which level is missing
+        menu_exists, _ = await check_hierarchy(db, menu_id=menu_id, submenu_id=submenu_id)
+        if not menu_exists:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        raise HTTPException(status_code=404, detail="Submenu not found")
+    await db.commit()
+    return db_submenu
+
+
+async def update_dish(db: AsyncSession, menu_id: UUID, submenu_id: UUID, dish_id: UUID, dish: schemas.DishUpdate):
+    stmt = (update(models.Dish)
+            .where(models.Dish.id == dish_id,
+                   models.Dish.submenu_id == submenu_id,
+                   models.Dish.submenu_id.in_(select(models.SubMenu.id).where(models.SubMenu.menu_id == menu_id)))
+            .values(**dish_values(dish))
+            .returning(models.Dish.id, models.Dish.title, models.Dish.description, models.Dish.price))
+    db_dish = (await db.execute(stmt)).first()
+    if db_dish is None:
+        # nothing updated, find out which level is missing
+        menu_exists, submenu_exists, _ = await check_hierarchy(db, menu_id=menu_id, submenu_id=submenu_id,
+                                                               dish_id=dish_id)
+        if not menu_exists:
+            raise HTTPException(status_code=404, detail="Menu not found")
+        if not submenu_exists:
+            raise HTTPException(status_code=404, detail="Submenu not found")
+        raise HTTPException(status_code=404, detail="Dish not found")
+    await db.commit()
+    return db_dish
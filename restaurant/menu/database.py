@@ -1,18 +1,23 @@
+import asyncio
+
 from sqlalchemy import URL
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker
 
 from .config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_BASE, DB_URL
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def warm_up_pool():
+    # open pool_size connections up front so the first requests do not pay for connecting
+    connections = await asyncio.gather(*(engine.connect() for _ in range(engine.pool.size())))
+    await asyncio.gather(*(connection.close() for connection in connections))
 
 
 if DB_URL:
@@ -21,7 +26,7 @@ else:
     DB = DB_HOST
 
 url_object = URL.create(
-    "postgresql",
+    "postgresql+asyncpg",
     username=DB_USER,
     password=DB_PASSWORD,
     host=DB,
@@ -30,10 +35,11 @@ url_object = URL.create(
 )
 
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_BASE}"
+# Sync driver URL for Alembic migrations
+SQLALCHEMY_DATABASE_URL = url_object.set(drivername="postgresql").render_as_string(hide_password=False)
 
-engine = create_engine(url_object)
+engine = create_async_engine(url_object, pool_size=20, max_overflow=10, pool_pre_ping=True, pool_recycle=1800)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
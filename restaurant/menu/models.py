@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, String, Numeric
+from sqlalchemy import BigInteger, Column, ForeignKey, String
 from sqlalchemy.dialects.postgresql.base import UUID
 from sqlalchemy.orm import relationship
 
@@ -17,6 +17,7 @@ class Menu(Base):
         back_populates="parent",
         cascade="all, delete",
         passive_deletes=True,
+        lazy="raise",
     )
 
 
@@ -26,13 +27,14 @@ class SubMenu(Base):
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     title = Column(String, unique=True, index=True)
     description = Column(String, default='')
-    menu_id = Column(UUID, ForeignKey("menus.id", ondelete="CASCADE"))
+    menu_id = Column(UUID, ForeignKey("menus.id", ondelete="CASCADE"), index=True)
     parent = relationship("Menu", back_populates="children")
     children = relationship(
         "Dish",
         back_populates="parent",
         cascade="all, delete",
         passive_deletes=True,
+        lazy="raise",
     )
 
 
@@ -42,6 +44,7 @@ class Dish(Base):
     id = Column(UUID, primary_key=True,default=uuid.uuid4)
     title = Column(String, unique=True, index=True)
     description = Column(String, default='')
-    price = Column(Numeric(10, 2), default=0.00)
-    submenu_id = Column(UUID, ForeignKey("submenus.id", ondelete="CASCADE"))
+    # whole cents
+    price = Column(BigInteger, default=0)
+    submenu_id = Column(UUID, ForeignKey("submenus.id", ondelete="CASCADE"), index=True)
     parent = relationship("SubMenu", back_populates="children")
@@ -1,24 +1,28 @@
 from typing import List
+from uuid import UUID
 
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi.exceptions import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import schemas, crud
+from .cache import cache, clear_cache
 from .database import get_db
 
 menu_router = APIRouter()
 
 
 @menu_router.get("/", response_model=List[schemas.Menu])
-def get_menus(db: Session = Depends(get_db)):
-    return crud.get_menus(db=db)
+@cache(namespace="menus", ttl=300)
+async def get_menus(db: AsyncSession = Depends(get_db)):
+    return await crud.get_menus(db=db)
 
 
 @menu_router.get("/{menu_id}/", response_model=schemas.Menu)
-def get_menu_by_id(menu_id, db: Session = Depends(get_db)):
-    menu = crud.get_menu_by_id(db=db, menu_id=menu_id)
+@cache(namespace="menus", ttl=300)
+async def get_menu_by_id(menu_id: UUID, db: AsyncSession = Depends(get_db)):
+    menu = await crud.get_menu_by_id(db=db, menu_id=menu_id)
     if menu is None:
         raise HTTPException(status_code=404, detail="menu not found")
     else:
@@ -26,14 +30,16 @@ def get_menu_by_id(menu_id, db: Session = Depends(get_db)):
 
 
 @menu_router.get("/{menu_id}/submenus/", response_model=List[schemas.SubMenu])
-def get_submenus(menu_id, db: Session = Depends(get_db)):
-    submenus = crud.get_submenus(db=db, menu_id=menu_id)
+@cache(namespace="menus", ttl=300)
+async def get_submenus(menu_id: UUID, db: AsyncSession = Depends(get_db)):
+    submenus = await crud.get_submenus(db=db, menu_id=menu_id)
     return submenus
 
 
 @menu_router.get("/{menu_id}/submenus/{submenu_id}/", response_model=schemas.SubMenu)
-def get_submenu_by_id(menu_id, submenu_id, db: Session = Depends(get_db)):
-    submenus = crud.get_submenu_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id)
+@cache(namespace="menus", ttl=300)
+async def get_submenu_by_id(menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_db)):
+    submenus = await crud.get_submenu_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id)
     if submenus is None:
         raise HTTPException(status_code=404, detail="submenu not found")
     else:
@@ -41,14 +47,16 @@ def get_submenu_by_id(menu_id, submenu_id, db: Session = Depends(get_db)):
 
 
 @menu_router.get("/{menu_id}/submenus/{submenu_id}/dishes/", response_model=List[schemas.Dish])
-def get_dishes(menu_id, submenu_id, db: Session = Depends(get_db)):
-    dishes = crud.get_dishes(db=db, menu_id=menu_id, submenu_id=submenu_id)
+@cache(namespace="menus", ttl=300)
+async def get_dishes(menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_db)):
+    dishes = await crud.get_dishes(db=db, menu_id=menu_id, submenu_id=submenu_id)
     return dishes
 
 
 @menu_router.get("/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}/", response_model=schemas.Dish)
-def get_dish_by_id(menu_id, submenu_id, dish_id, db: Session = Depends(get_db)):
-    dish = crud.get_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+@cache(namespace="menus", ttl=300)
+async def get_dish_by_id(menu_id: UUID, submenu_id: UUID, dish_id: UUID, db: AsyncSession = Depends(get_db)):
+    dish = await crud.get_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
     if dish is None:
         raise HTTPException(status_code=404, detail="dish not found")
     else:
@@ -56,60 +64,68 @@ def get_dish_by_id(menu_id, submenu_id, dish_id, db: Session = Depends(get_db)):
 
 
 @menu_router.post("/", response_model=schemas.MenuCreate, status_code=201)
-def create_menu(menu: schemas.MenuBase, db: Session = Depends(get_db)):
-    db_menu = crud.get_menu_by_title(db=db, title=menu.title)
-    if db_menu:
-        raise HTTPException(status_code=400, detail="Title of Menu already registered")
-    return crud.create_menu(db=db, menu=menu)
+async def create_menu(menu: schemas.MenuBase, db: AsyncSession = Depends(get_db)):
+    result = await crud.create_menu(db=db, menu=menu)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.post("/{menu_id}/submenus/", response_model=schemas.SubMenuCreate, status_code=201)
-def create_submenu(menu_id, submenu: schemas.MenuBase, db: Session = Depends(get_db)):
-    db_menu = crud.check_menu_by_id(db=db, menu_id=menu_id)
+async def create_submenu(menu_id: UUID, submenu: schemas.MenuBase, db: AsyncSession = Depends(get_db)):
+    db_menu = await crud.check_menu_by_id(db=db, menu_id=menu_id)
     if not db_menu:
         raise HTTPException(status_code=400, detail="ID of Menu not registered")
-    db_submenu = crud.get_submenu_by_title(db=db, title=submenu.title)
-    if db_submenu:
-        raise HTTPException(status_code=400, detail="Title of Submenu already registered")
-    return crud.create_submenu(db=db, menu_id=menu_id, submenu=submenu)
+    result = await crud.create_submenu(db=db, menu_id=menu_id, submenu=submenu)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.post("/{menu_id}/submenus/{submenu_id}/dishes/", response_model=schemas.Dish, status_code=201)
-def create_dish(menu_id, submenu_id, dish: schemas.DishCreate, db: Session = Depends(get_db)):
-    db_menu = crud.check_menu_by_id(db=db, menu_id=menu_id)
-    if not db_menu:
-        raise HTTPException(status_code=400, detail="ID of Menu not registered")
-    db_submenu = crud.check_submenu_by_id(db=db, submenu_id=submenu_id)
-    if not db_submenu:
-        raise HTTPException(status_code=400, detail="ID of Submenu not registered")
-    return crud.create_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish=dish)
+async def create_dish(menu_id: UUID, submenu_id: UUID, dish: schemas.DishCreate, db: AsyncSession = Depends(get_db)):
+    result = await crud.create_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish=dish)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.patch("/{menu_id}/", response_model=schemas.Menu)
-def update_menu(menu_id, menu: schemas.MenuBase, db: Session = Depends(get_db)):
-    return crud.update_menu(db=db, menu_id=menu_id, menu=menu)
+async def update_menu(menu_id: UUID, menu: schemas.MenuBase, db: AsyncSession = Depends(get_db)):
+    result = await crud.update_menu(db=db, menu_id=menu_id, menu=menu)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.patch("/{menu_id}/submenus/{submenu_id}/", response_model=schemas.SubMenu)
-def update_submenu(menu_id, submenu_id, submenu: schemas.MenuBase, db: Session = Depends(get_db)):
-    return crud.update_submenu(db=db, menu_id=menu_id, submenu=submenu, submenu_id=submenu_id)
+async def update_submenu(menu_id: UUID, submenu_id: UUID, submenu: schemas.MenuBase,
+                         db: AsyncSession = Depends(get_db)):
+    result = await crud.update_submenu(db=db, menu_id=menu_id, submenu=submenu, submenu_id=submenu_id)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.patch("/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}/", response_model=schemas.Dish)
-def update_dish(menu_id, submenu_id, dish_id, dish: schemas.DishUpdate, db: Session = Depends(get_db)):
-    return crud.update_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id, dish=dish)
+async def update_dish(menu_id: UUID, submenu_id: UUID, dish_id: UUID, dish: schemas.DishUpdate,
+                      db: AsyncSession = Depends(get_db)):
+    result = await crud.update_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id, dish=dish)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.delete("/{menu_id}/")
-def delete_menu_by_id(menu_id, db: Session = Depends(get_db)):
-    return crud.delete_menu_by_id(db=db, menu_id=menu_id)
+async def delete_menu_by_id(menu_id: UUID, db: AsyncSession = Depends(get_db)):
+    result = await crud.delete_menu_by_id(db=db, menu_id=menu_id)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.delete("/{menu_id}/submenus/{submenu_id}/")
-def delete_submenu_by_id(menu_id, submenu_id, db: Session = Depends(get_db)):
-    return crud.delete_submenu_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id)
+async def delete_submenu_by_id(menu_id: UUID, submenu_id: UUID, db: AsyncSession = Depends(get_db)):
+    result = await crud.delete_submenu_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id)
+    await clear_cache(namespace="menus")
+    return result
 
 
 @menu_router.delete("/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}/")
-def delete_dish_by_id(menu_id, submenu_id, dish_id, db: Session = Depends(get_db)):
-    return crud.delete_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+async def delete_dish_by_id(menu_id: UUID, submenu_id: UUID, dish_id: UUID, db: AsyncSession = Depends(get_db)):
+    result = await crud.delete_dish_by_id(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+    await clear_cache(namespace="menus")
+    return result
@@ -2,7 +2,7 @@ import decimal
 import uuid
 from uuid import UUID
 
-from pydantic import BaseModel, condecimal, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
 
 
 class MenuBase(BaseModel):
@@ -44,12 +44,16 @@ class SubMenuUpdate(MenuBase):
 class Dish(MenuBase):
     model_config = ConfigDict(from_attributes=True)
 
-    price: condecimal(decimal_places=2)
+    price: int  # whole cents, as stored
+
+    @field_serializer('price')
+    def price_to_units(self, price: int) -> str:
+        return str(decimal.Decimal(price).scaleb(-2))
 
 
 class DishCreate(MenuBase):
     price: decimal.Decimal
 
 
-class DishUpdate(MenuBase):
-    price: decimal.Decimal
+class DishUpdate(DishCreate):
+    pass
@@ -1,22 +1,32 @@
+import asyncio
 import decimal
+import os
 import uuid
+from functools import partial
 from typing import Any
+from typing import AsyncGenerator
 from typing import Generator
+from typing import TYPE_CHECKING
 
+import httpx
+import orjson
 import pytest
-from fastapi import HTTPException, FastAPI
-from fastapi.testclient import TestClient
+from fastapi import FastAPI
+from redis.exceptions import RedisError
 from sqlalchemy import create_engine
-from sqlalchemy import delete, URL
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils import database_exists, create_database
+from sqlalchemy import insert, text, URL
+from sqlalchemy.ext.asyncio import AsyncConnection, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool, StaticPool
 
-from ..menu import models
-from ..menu.crud import is_valid_uuid
+from ..menu import cache, crud, models, schemas
 from ..menu.database import url_object, Base, get_db
 from ..menu.routers import menu_router
 
+# TestClient and sqlalchemy_utils are imported by the fixtures that use them, collection does not pay for them
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+
 
 def start_application():
     app = FastAPI()
@@ -25,65 +35,229 @@ def start_application():
     return app
 
 
+# pytest-xdist workers get a database each
+worker = os.environ.get("PYTEST_XDIST_WORKER")
+
 test_url = URL.create(
     "postgresql",
     username=url_object.username,
     password=url_object.password,
-    host=url_object.host,
-    database='tests',
+    # a socket directory such as /var/run/postgresql connects over the unix socket
+    host=os.environ.get("TEST_DB_HOST", url_object.host),
+    database=f'tests_{worker}' if worker else 'tests',
     port=url_object.port,
 )
 
-engine = create_engine(test_url)
+# test data is thrown away, so commits do not need to wait for the WAL flush
+engine = create_engine(test_url, poolclass=StaticPool, connect_args={"options": "-c synchronous_commit=off"})
 
-if not database_exists(engine.url):
-    create_database(engine.url)
+# NullPool: connections are opened on both the TestClient and the async test event loops
+async_engine = create_async_engine(test_url.set(drivername="postgresql+asyncpg"), poolclass=NullPool,
+                                   connect_args={"server_settings": {"synchronous_commit": "off"}})
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# same session settings as the application, see menu.database.SessionLocal
+TestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
-@pytest.fixture(scope="function")
-def app() -> Generator[FastAPI, Any, None]:
+def truncate_all():
+    tables = ', '.join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _ensure_db() -> None:
     """
-    Create a fresh database on each test case.
+    Create the test database once per test run if it is missing.
+    """
+    from sqlalchemy_utils import database_exists, create_database
+
+    if not database_exists(test_url):
+        # template0 is the plain catalog copy, nothing has to be cloned from template1
+        create_database(test_url, template="template0")
+
+
+@pytest.fixture(scope="session")
+def _app() -> Generator[FastAPI, Any, None]:
+    """
+    Create the tables and the application once per test run.
     """
     Base.metadata.create_all(engine)  # Create the tables.
-    _app = start_application()
+    truncate_all()  # Drop whatever an interrupted run left behind.
+    yield start_application()
+
+
+@pytest.fixture(scope="function")
+def app(_app: FastAPI) -> Generator[FastAPI, Any, None]:
+    """
+    Hand the shared application to a test and drop its dependency overrides afterwards.
+    """
     yield _app
-    # Base.metadata.drop_all(engine)
+    _app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="session")
+def _client(_app: FastAPI) -> Generator["TestClient", Any, None]:
+    """
+    Start the application once per test run; its event loop also holds the test connections.
+    Tests get it through `client`, which sets up the database override.
+    """
+    from fastapi.testclient import TestClient
+
+    with TestClient(_app, base_url="http://testserver/api/v1/menus", raise_server_exceptions=False) as client:
+        yield client
 
 
 @pytest.fixture(scope="function")
-def db_session(app: FastAPI) -> Generator[TestingSessionLocal, Any, None]:
-    connection = engine.connect()
+def connection(_client: "TestClient") -> Generator[AsyncConnection, Any, None]:
+    """
+    Open a connection inside a transaction that is rolled back after the test.
+    """
+    connection = async_engine.connect()
+    _client.portal.call(connection.start)
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
-    yield session  # use the session in tests.
-    session.close()
-    transaction.rollback()
-    connection.close()
+    _client.portal.call(transaction.start)
+    yield connection
+    _client.portal.call(transaction.rollback)
+    _client.portal.call(connection.close)
 
 
 @pytest.fixture(scope="function")
-def client(
-        app: FastAPI, db_session: TestingSessionLocal
-) -> Generator[TestClient, Any, None]:
+def client(app: FastAPI, _client: "TestClient", connection: AsyncConnection) -> Generator["TestClient", Any, None]:
     """
-    Create a new FastAPI TestClient that uses the `db_session` fixture to override
-    the `get_db` dependency that is injected into routes.
+    Override the `get_db` dependency with sessions joined to the test transaction:
+    their commits only release a SAVEPOINT, nothing reaches the database.
     """
 
-    def _get_test_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def _get_test_db():
+        async with TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint") as db:
+            yield db
 
     app.dependency_overrides[get_db] = _get_test_db
-    with TestClient(app) as client:
+    yield _client
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _no_cache() -> Generator[None, Any, None]:
+    """
+    Switch the Redis cache off: responses cached by one test would outlive its rolled-back transaction,
+    and rows seeded straight into the database never invalidate them.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(cache, "redis", None)
+        yield
+
+
+class FakeRedis:
+    """
+    The part of redis.asyncio.Redis the cache uses, kept in a dict.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise RedisError("Redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self._check()
+        self.store[key] = value
+
+    async def incr(self, key):
+        self._check()
+        self.store[key] = int(self.store.get(key, 0)) + 1
+        return self.store[key]
+
+
+@pytest.fixture(scope="function")
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    """
+    Turn the cache on for one test, backed by a FakeRedis.
+    """
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "redis", fake)
+    return fake
+
+
+@pytest.fixture(scope="function")
+def _truncate_all() -> Generator[None, Any, None]:
+    """
+    Empty the tables after a test that commits outside the rolled-back test transaction.
+    """
+    yield
+    truncate_all()
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope="function")
+async def async_client(app: FastAPI) -> AsyncGenerator[httpx.AsyncClient, None]:
+    """
+    Create an httpx AsyncClient that calls the application in the test's event loop.
+    Every request gets its own session and connection, so independent requests can run concurrently;
+    what they commit is not rolled back and has to be cleaned up by the test.
+    """
+
+    async def _get_test_db():
+        async with TestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = _get_test_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://testserver/api/v1/menus", follow_redirects=True) as client:
         yield client
 
 
+async def seed(connection: AsyncConnection, menus=(), submenus=(), dishes=()):
+    """
+    Insert rows straight into the database, skipping the HTTP layer for test setup.
+    The bodies go through the API schemas and crud, so they are stored the way the API would store them.
+    """
+    menu_rows = [schemas.MenuBase(**menu).model_dump() for menu in menus]
+    submenu_rows = [{**schemas.MenuBase(**submenu).model_dump(), 'menu_id': menu_id} for menu_id, submenu in submenus]
+    dish_rows = [{**crud.dish_values(schemas.DishCreate(**dish)), 'submenu_id': submenu_id}
+                 for submenu_id, dish in dishes]
+    for model, rows in ((models.Menu, menu_rows), (models.SubMenu, submenu_rows), (models.Dish, dish_rows)):
+        if rows:
+            await connection.execute(insert(model), rows)
+
+
+@pytest.fixture(scope="function")
+def created_menu(client: "TestClient", connection: AsyncConnection) -> dict:
+    """
+    Seed the test menu.
+    """
+    client.portal.call(partial(seed, connection, menus=[MENU_BODY]))
+    return MENU_BODY
+
+
+@pytest.fixture(scope="function")
+def created_submenu(client: "TestClient", connection: AsyncConnection, created_menu: dict) -> dict:
+    """
+    Seed the test submenu in the test menu.
+    """
+    client.portal.call(partial(seed, connection, submenus=[(MENU_ID, SUBMENU_BODY)]))
+    return SUBMENU_BODY
+
+
+@pytest.fixture(scope="function")
+def created_dish(client: "TestClient", connection: AsyncConnection, created_submenu: dict) -> dict:
+    """
+    Seed the test dish in the test submenu.
+    """
+    client.portal.call(partial(seed, connection, dishes=[(SUBMENU_ID, DISH_BODY)]))
+    return DISH_BODY
+
+
 menu_test = {
     "title": "menu1",
     "description": "menu1",
@@ -106,531 +280,337 @@ dish_test = {
     "price": "115.455"
 }
 
-'''
- START MENU TESTS
-'''
-
-
-def test_read_empty_menu(client):
-    with Session(engine) as session:
-        session.execute(delete(models.Menu))
-        session.commit()
-    response = client.get("/")
-    assert response.status_code == 200
-    assert response.json() == []
-
-
-def test_create_menu(client):
-    response = client.post(
-        "/",
-        json={
-            'id': menu_test['id'],
-            "title": menu_test['title'],
-            "description": menu_test['description'],
-        },
-    )
-    data = response.json()
-    assert response.status_code == 201
-    assert data["title"] == menu_test['title']
-    assert data["description"] == menu_test['description']
-    assert data["submenus_count"] == menu_test['submenus_count']
-    assert data["dishes_count"] == menu_test['dishes_count']
-    assert data["id"] is not None
-    assert is_valid_uuid(data["id"]) is True
-
-
-def test_delete_wrong_menu_by_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.delete("/11111/")
-    assert err.value.status_code == 422
-    assert err.value.detail == "Wrong id type"
-
-
-def test_delete_menu_by_id(client):
-    response = client.delete(f"/{menu_test['id']}/")
-    assert response.status_code == 200
-    assert response.json() == {"status": True, "message": "The menu has been deleted"}
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "menu not found"
-
-
-def test_menu_id_not_found(client):
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "menu not found"
-
-
-def test_menu_is_already_registered(client):
-    client.post("/",
-                json={
-                    'id': menu_test['id'],
-                    "title": menu_test['title'],
-                    "description": menu_test['description'],
-                },
-                )
-    with pytest.raises(HTTPException) as err:
-        client.post("/",
-                    json={
-                        'id': menu_test['id'],
-                        "title": menu_test['title'],
-                        "description": menu_test['description'],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "Title of Menu already registered"
-
-
-def test_read_menu(client):
-    response = client.get("/")
-    assert response.status_code == 200
-    data = response.json()
-    assert type(data) is list
-    assert type(data[0]) is dict
-    for menu in data:
-        for key in menu.keys():
-            assert key in ('id', 'title', 'description', 'submenus_count', 'dishes_count')
-    assert menu_test in data
+MENU_ID = menu_test['id']
+SUBMENU_ID = submenu_test['id']
+DISH_ID = dish_test['id']
 
+MENU_URL = f"/{MENU_ID}/"
+SUBMENUS_URL = f"{MENU_URL}submenus/"
+SUBMENU_URL = f"{SUBMENUS_URL}{SUBMENU_ID}/"
+DISHES_URL = f"{SUBMENU_URL}dishes/"
+DISH_URL = f"{DISHES_URL}{DISH_ID}/"
 
-def test_read_menu_by_id(client):
-    response = client.get(f"/{menu_test['id']}")
-    assert response.status_code == 200
-    assert response.json() == menu_test
-
+MENU_BODY = {
+    'id': MENU_ID,
+    "title": menu_test['title'],
+    "description": menu_test['description'],
+}
+SUBMENU_BODY = {
+    'id': SUBMENU_ID,
+    "title": submenu_test['title'],
+    "description": submenu_test['description'],
+}
+DISH_BODY = {
+    'id': DISH_ID,
+    "title": dish_test['title'],
+    "description": dish_test['description'],
+    "price": dish_test["price"],
+}
 
-def test_update_menu(client):
-    response = client.patch(f"/{menu_test['id']}/",
-                            json={
-                                "id": menu_test['id'],
-                                "title": menu_test['title'],
-                                "description": "this field has been changed",
-                            },
-                            )
-    assert response.status_code == 200
-    data = response.json()
-    assert data['description'] == "this field has been changed"
+# the API rounds prices to cents, half away from zero
+DISH_PRICE_FORMATTED = str(decimal.Decimal(dish_test["price"]).quantize(decimal.Decimal('0.00'), decimal.ROUND_HALF_UP))
 
+# request bodies serialized once, sent as raw content
+MENU_JSON = orjson.dumps(MENU_BODY)
+SUBMENU_JSON = orjson.dumps(SUBMENU_BODY)
+DISH_JSON = orjson.dumps(DISH_BODY)
+JSON_HEADERS = {"content-type": "application/json"}
 
-'''
- START SUBMENU TESTS
-'''
+dish_expected = {**dish_test, "price": DISH_PRICE_FORMATTED}
 
 
-def test_read_empty_submenu(client):
-    with Session(engine) as session:
-        session.execute(delete(models.SubMenu))
-        session.commit()
-    response = client.get(f"/{menu_test['id']}/submenus/")
+@pytest.mark.parametrize("url, seed", [
+    pytest.param("/", None, id="menu"),
+    pytest.param(SUBMENUS_URL, "created_menu", id="submenu"),
+    pytest.param(DISHES_URL, "created_submenu", id="dish"),
+])
+def test_read_empty(client, request, url, seed):
+    if seed:
+        request.getfixturevalue(seed)
+    response = client.get(url)
     assert response.status_code == 200
     assert response.json() == []
 
 
-def test_create_submenu(client):
-    response = client.post(
-        f"/{menu_test['id']}/submenus/",
-        json={
-            'id': submenu_test['id'],
-            "title": submenu_test['title'],
-            "description": submenu_test['description'],
-        },
-    )
-    data = response.json()
+@pytest.mark.parametrize("url, body, seed, expected", [
+    pytest.param("/", MENU_JSON, None, menu_test, id="menu"),
+    pytest.param(SUBMENUS_URL, SUBMENU_JSON, "created_menu", submenu_test, id="submenu"),
+    pytest.param(DISHES_URL, DISH_JSON, "created_submenu", dish_expected, id="dish"),
+    pytest.param(DISHES_URL, orjson.dumps({**DISH_BODY, "price": 115}), "created_submenu",
+                 {**dish_expected, "price": "115.00"}, id="dish-whole-price"),
+])
+def test_create(client, request, url, body, seed, expected):
+    if seed:
+        request.getfixturevalue(seed)
+    response = client.post(url, content=body, headers=JSON_HEADERS)
     assert response.status_code == 201
-    assert data["title"] == submenu_test['title']
-    assert data["description"] == submenu_test['description']
-    assert data["dishes_count"] == submenu_test['dishes_count']
-    assert data["id"] is not None
-    assert is_valid_uuid(data["id"]) is True
+    assert response.json() == expected
 
 
-def test_read_submenu(client):
-    response = client.get(f"/{menu_test['id']}/submenus/")
+@pytest.mark.parametrize("url, seed, expected", [
+    pytest.param("/", "created_menu", menu_test, id="menu"),
+    pytest.param(SUBMENUS_URL, "created_submenu", submenu_test, id="submenu"),
+    pytest.param(DISHES_URL, "created_dish", dish_expected, id="dish"),
+])
+def test_read_list(client, request, url, seed, expected):
+    request.getfixturevalue(seed)
+    response = client.get(url)
     assert response.status_code == 200
     data = response.json()
     assert type(data) is list
-    assert type(data[0]) is dict
-    for submenu in data:
-        for key in submenu.keys():
-            assert key in ('id', 'title', 'description', 'dishes_count')
-    assert submenu_test in data
-
-
-def test_read_submenu_by_id(client):
-    response = client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/")
-    assert response.status_code == 200
-    assert response.json() == submenu_test
-
-
-def test_create_submenu_wrong_menu_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.post("/1111/submenus/",
-                    json={
-                        'id': submenu_test['id'],
-                        "title": submenu_test['title'],
-                        "description": submenu_test['description'],
-                    },
-                    )
-    assert err.value.status_code == 422
-    assert err.value.detail == "Wrong id type"
-
-
-def test_submenu_menu_id_is_not_registered(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{uuid.uuid4()}/submenus/",
-                    json={
-                        'id': submenu_test['id'],
-                        "title": submenu_test['title'],
-                        "description": submenu_test['description'],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "ID of Menu not registered"
-
-
-def test_submenu_title_is_already_registered(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{menu_test['id']}/submenus/",
-                    json={
-                        'id': submenu_test['id'],
-                        "title": submenu_test['title'],
-                        "description": submenu_test['description'],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "Title of Submenu already registered"
-
-
-def test_submenu_id_not_found(client):
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}/submenus/{uuid.uuid4()}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "submenu not found"
-
-
-def test_delete_wrong_submenu_by_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.delete(f"/{menu_test['id']}/submenus/1")
-    assert err.value.status_code == 422
-    assert err.value.detail == "One or more wrong types id"
-
-
-def test_delete_submenu_by_id(client):
-    response = client.delete(f"/{menu_test['id']}/submenus/{submenu_test['id']}")
-    assert response.status_code == 200
-    assert response.json() == {"status": True, "message": "The submenu has been deleted"}
-    response = client.get(f"/{menu_test['id']}")
+    for item in data:
+        assert item.keys() == expected.keys()
+    assert expected in data
+
+
+@pytest.mark.parametrize("url, seed, expected", [
+    pytest.param(MENU_URL, "created_menu", menu_test, id="menu"),
+    pytest.param(SUBMENU_URL, "created_submenu", submenu_test, id="submenu"),
+    pytest.param(DISH_URL, "created_dish", dish_expected, id="dish"),
+])
+def test_read_by_id(client, request, url, seed, expected):
+    request.getfixturevalue(seed)
+    response = client.get(url)
     assert response.status_code == 200
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}/submenus/{uuid.uuid4()}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "submenu not found"
-
-
-def test_submenu_is_already_registered(client):
-    client.post(f"/{menu_test['id']}/submenus/",
-                json={
-                    'id': submenu_test['id'],
-                    "title": submenu_test['title'],
-                    "description": submenu_test['description'],
-                },
-                )
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{menu_test['id']}/submenus/",
-                    json={
-                        'id': submenu_test['id'],
-                        "title": submenu_test['title'],
-                        "description": submenu_test['description'],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "Title of Submenu already registered"
-
-
-def test_update_submenu(client):
-    response = client.patch(f"/{menu_test['id']}/submenus/{submenu_test['id']}/",
-                            json={
-
-                                "id": submenu_test['id'],
-                                "title": submenu_test['title'],
-                                "description": "this field has been changed",
-                            },
-                            )
-    assert response.status_code == 200
-    data = response.json()
-    assert data['description'] == "this field has been changed"
-
-
-'''
- START DISH TESTS
-'''
-
-
-def test_read_empty_dishes(client):
-    with Session(engine) as session:
-        session.execute(delete(models.Dish))
-        session.commit()
-    response = client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/")
-    assert response.status_code == 200
-    assert response.json() == []
-
-
-def test_create_dish(client):
-    response = client.post(
-        f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/",
-        json={
-            'id': dish_test['id'],
-            "title": dish_test['title'],
-            "description": dish_test['description'],
-            "price": dish_test["price"],
-        },
-    )
-    data = response.json()
-    assert response.status_code == 201
-    assert data["title"] == dish_test['title']
-    assert data["description"] == dish_test['description']
-    assert data["price"] == str(decimal.Decimal(dish_test["price"]).quantize(decimal.Decimal('0.00')))
-    assert data["id"] is not None
-    assert is_valid_uuid(data["id"]) is True
-
-
-def test_read_dishes(client):
-    response = client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/")
-    assert response.status_code == 200
-    data = response.json()
-    assert type(data) is list
-    assert type(data[0]) is dict
-    for submenu in data:
-        for key in submenu.keys():
-            assert key in ('id', 'title', 'description', 'price')
-    assert {
-               'id': dish_test['id'],
-               "title": dish_test['title'],
-               "description": dish_test['description'],
-               "price": str(decimal.Decimal(dish_test["price"]).quantize(decimal.Decimal('0.00'))),
-           } in data
-
-
-def test_read_dish_by_id(client):
-    response = client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/{dish_test['id']}")
+    assert response.json() == expected
+
+
+@pytest.mark.parametrize("url, seed, detail", [
+    pytest.param(MENU_URL, None, "menu not found", id="menu"),
+    pytest.param(f"{SUBMENUS_URL}{uuid.uuid4()}/", "created_menu", "submenu not found", id="submenu"),
+    pytest.param(f"{DISHES_URL}{uuid.uuid4()}/", "created_submenu", "dish not found", id="dish"),
+])
+def test_id_not_found(client, request, url, seed, detail):
+    if seed:
+        request.getfixturevalue(seed)
+    response = client.get(url)
+    assert response.status_code == 404
+    assert response.json()["detail"] == detail
+
+
+@pytest.mark.parametrize("method, url, body, param", [
+    pytest.param("DELETE", "/11111/", None, "menu_id", id="delete-menu"),
+    pytest.param("POST", "/1111/submenus/", SUBMENU_JSON, "menu_id", id="create-submenu"),
+    pytest.param("DELETE", f"{SUBMENUS_URL}1/", None, "submenu_id", id="delete-submenu"),
+    pytest.param("POST", f"/111/submenus/{SUBMENU_ID}/dishes/", DISH_JSON, "menu_id", id="create-dish-menu"),
+    pytest.param("POST", f"{SUBMENUS_URL}1wwew231/dishes/", DISH_JSON, "submenu_id", id="create-dish-submenu"),
+    pytest.param("DELETE", f"{DISHES_URL}1111/", None, "dish_id", id="delete-dish"),
+])
+def test_wrong_id(client, method, url, body, param):
+    response = client.request(method, url, content=body, headers=JSON_HEADERS)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["path", param]
+
+
+@pytest.mark.parametrize("url, body, seed, detail", [
+    pytest.param(f"/{uuid.uuid4()}/submenus/", SUBMENU_JSON, None, "ID of Menu not registered", id="submenu-menu"),
+    pytest.param(f"/{uuid.uuid4()}/submenus/{SUBMENU_ID}/dishes/", DISH_JSON, None, "ID of Menu not registered",
+                 id="dish-menu"),
+    pytest.param(f"{SUBMENUS_URL}{uuid.uuid4()}/dishes/", DISH_JSON, "created_menu", "ID of Submenu not registered",
+                 id="dish-submenu"),
+])
+def test_parent_is_not_registered(client, request, url, body, seed, detail):
+    if seed:
+        request.getfixturevalue(seed)
+    response = client.post(url, content=body, headers=JSON_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+@pytest.mark.parametrize("url, body, seed, detail", [
+    pytest.param("/", MENU_JSON, "created_menu", "Title of Menu already registered", id="menu"),
+    pytest.param(SUBMENUS_URL, SUBMENU_JSON, "created_submenu", "Title of Submenu already registered", id="submenu"),
+    pytest.param(DISHES_URL, orjson.dumps({**DISH_BODY, "id": f"{uuid.uuid4()}"}), "created_dish",
+                 "A duplicate record already exists", id="dish"),
+])
+def test_already_registered(client, request, url, body, seed, detail):
+    request.getfixturevalue(seed)
+    response = client.post(url, content=body, headers=JSON_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+@pytest.mark.parametrize("url, body, seed, expected", [
+    pytest.param(MENU_URL, orjson.dumps({**MENU_BODY, "description": "this field has been changed"}),
+                 "created_menu", {"description": "this field has been changed"}, id="menu"),
+    pytest.param(SUBMENU_URL, orjson.dumps({**SUBMENU_BODY, "description": "this field has been changed"}),
+                 "created_submenu", {"description": "this field has been changed"}, id="submenu"),
+    pytest.param(DISH_URL, orjson.dumps({**DISH_BODY, "description": "this field has been changed", "price": '7.777'}),
+                 "created_dish", {"description": "this field has been changed", "price": "7.78"}, id="dish"),
+])
+def test_update(client, request, url, body, seed, expected):
+    request.getfixturevalue(seed)
+    response = client.patch(url, content=body, headers=JSON_HEADERS)
     assert response.status_code == 200
     data = response.json()
-    assert data["id"] == dish_test['id']
-    assert data["title"] == dish_test['title']
-    assert data["description"] == dish_test['description']
-    assert data["price"] == str(decimal.Decimal(dish_test["price"]).quantize(decimal.Decimal('0.00')))
-
-
-def test_create_dish_wrong_menu_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/111/submenus/{submenu_test['id']}/dishes/",
-                    json={
-                        'id': dish_test['id'],
-                        "title": dish_test['title'],
-                        "description": dish_test['description'],
-                        "price": dish_test["price"],
-                    },
-                    )
-    assert err.value.status_code == 422
-    assert err.value.detail == "Wrong id type"
-
-
-def test_create_dish_wrong_submenu_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{menu_test['id']}/submenus/1wwew231/dishes/",
-                    json={
-                        'id': dish_test['id'],
-                        "title": dish_test['title'],
-                        "description": dish_test['description'],
-                        "price": dish_test["price"],
-                    },
-                    )
-    assert err.value.status_code == 422
-    assert err.value.detail == "Wrong id type"
-
-
-def test_dish_menu_id_is_not_registered(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{uuid.uuid4()}/submenus/{submenu_test['id']}/dishes/",
-                    json={
-                        'id': dish_test['id'],
-                        "title": dish_test['title'],
-                        "description": dish_test['description'],
-                        "price": dish_test["price"],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "ID of Menu not registered"
-
-
-def test_dish_submenu_id_is_not_registered(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{menu_test['id']}/submenus/{uuid.uuid4()}/dishes/",
-                    json={
-                        'id': dish_test['id'],
-                        "title": dish_test['title'],
-                        "description": dish_test['description'],
-                        "price": dish_test["price"],
-                    },
-                    )
-    assert err.value.status_code == 400
-    assert err.value.detail == "ID of Submenu not registered"
-
-
-def test_dish_title_is_already_registered(client):
-    with pytest.raises(HTTPException) as err:
-        client.post(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/",
-                    json={
-                        'id': dish_test['id'],
-                        "title": dish_test['title'],
-                        "description": dish_test['description'],
-                        "price": dish_test["price"],
-                    },
-                    )
-    assert err.value.status_code == 500
-    assert err.value.detail == "A duplicate record already exists"
-
-
-def test_dish_id_not_found(client):
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/{uuid.uuid4()}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "dish not found"
-
-
-def test_delete_dish_by_wrong_id(client):
-    with pytest.raises(HTTPException) as err:
-        client.delete(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/1111")
-    assert err.value.status_code == 422
-    assert err.value.detail == "One or more wrong types id"
-
-
-def test_update_dish(client):
-    response = client.patch(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/{dish_test['id']}",
-                            json={
-
-                                'id': dish_test['id'],
-                                "title": dish_test['title'],
-                                "description": "this field has been changed",
-                                "price": '7.777',
-                            },
-                            )
+    for key, value in expected.items():
+        assert data[key] == value
+
+
+@pytest.mark.parametrize("url, seed, name, parent_url", [
+    pytest.param(MENU_URL, "created_menu", "menu", None, id="menu"),
+    pytest.param(SUBMENU_URL, "created_submenu", "submenu", MENU_URL, id="submenu"),
+    pytest.param(DISH_URL, "created_dish", "dish", SUBMENU_URL, id="dish"),
+])
+def test_delete_by_id(client, request, url, seed, name, parent_url):
+    request.getfixturevalue(seed)
+    response = client.delete(url)
     assert response.status_code == 200
-    data = response.json()
-    assert data['description'] == "this field has been changed"
-    assert data['price'] == "7.78"
-
-
-def test_delete_dish_by_id(client):
-    response = client.delete(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/{dish_test['id']}")
-    assert response.status_code == 200
-    assert response.json() == {"status": True, "message": "The dish has been deleted"}
-    response = client.get(f"/{menu_test['id']}")
-    assert response.status_code == 200
-    response = client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/")
-    assert response.status_code == 200
-    with pytest.raises(HTTPException) as err:
-        client.get(f"/{menu_test['id']}/submenus/{submenu_test['id']}/dishes/{uuid.uuid4()}")
-    assert err.value.status_code == 404
-    assert err.value.detail == "dish not found"
-
-
-def test_count_submenu_and_dish_of_menu(client):
-    with Session(engine) as session:
-        session.execute(delete(models.Menu))
-        session.commit()
-
-    # create menu
+    assert response.json() == {"status": True, "message": f"The {name} has been deleted"}
+    response = client.get(url)
+    assert response.status_code == 404
+    assert response.json()["detail"] == f"{name} not found"
+    if parent_url:
+        response = client.get(parent_url)
+        assert response.status_code == 200
+
+
+@pytest.mark.anyio
+@pytest.mark.usefixtures("_truncate_all")
+async def test_count_submenu_and_dish_of_menu(async_client):
     menu = {
         "id": f"{uuid.uuid4()}",
         "title": "menu1",
         "description": "about menu1",
     }
-    response = client.post("/", json=menu)
-    assert response.status_code == 201
-    assert response.json()['id'] == menu['id']
-    response = client.get(f"/{menu['id']}")
-    assert response.status_code == 200
-
-    # create submenu
     submenu = {
         "id": f"{uuid.uuid4()}",
         "title": "submenu1",
         "description": "about submenu1",
     }
-    response = client.post(f"/{menu['id']}/submenus/", json=submenu)
-    assert response.status_code == 201
-    assert response.json()['id'] == submenu['id']
-    response = client.get(f"/{menu['id']}/submenus/{submenu['id']}/")
-    assert response.status_code == 200
-
-    # create dish1
     dish1 = {
         "id": f"{uuid.uuid4()}",
         "title": "dish1",
         "description": "about dish1",
         "price": "13.50"
     }
-    response = client.post(f"/{menu['id']}/submenus/{submenu['id']}/dishes/", json=dish1)
-    assert response.status_code == 201
-    assert response.json()['id'] == dish1['id']
-    response = client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/{dish1['id']}")
-    assert response.status_code == 200
-
-    # create dish2
     dish2 = {
         "id": f"{uuid.uuid4()}",
         "title": "dish2",
         "description": "about dish2",
         "price": "12.50"
     }
-    response = client.post(f"/{menu['id']}/submenus/{submenu['id']}/dishes/", json=dish2)
-    assert response.status_code == 201
-    assert response.json()['id'] == dish2['id']
-    response = client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/{dish2['id']}")
-    assert response.status_code == 200
-
-    # Views a specific menu
-    response = client.get(f"/{menu['id']}/")
-    assert response.status_code == 200
-    assert response.json()['id'] == menu['id']
-    assert response.json()['submenus_count'] == 1
-    assert response.json()['dishes_count'] == 2
-
-    # Views a specific submenu
-    response = client.get(f"/{menu['id']}/submenus/{submenu['id']}/")
-    assert response.status_code == 200
-    assert response.json()['id'] == submenu['id']
-    assert response.json()['dishes_count'] == 2
+    async with async_engine.begin() as connection:
+        await seed(connection, menus=[menu], submenus=[(menu['id'], submenu)],
+                   dishes=[(submenu['id'], dish1), (submenu['id'], dish2)])
+
+    # Views a specific menu, submenu and both dishes
+    menu_response, submenu_response, *dish_responses = await asyncio.gather(
+        async_client.get(f"/{menu['id']}/"),
+        async_client.get(f"/{menu['id']}/submenus/{submenu['id']}/"),
+        async_client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/{dish1['id']}/"),
+        async_client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/{dish2['id']}/"),
+    )
+    assert menu_response.status_code == 200
+    assert menu_response.json()['id'] == menu['id']
+    assert menu_response.json()['submenus_count'] == 1
+    assert menu_response.json()['dishes_count'] == 2
+    assert submenu_response.status_code == 200
+    assert submenu_response.json()['id'] == submenu['id']
+    assert submenu_response.json()['dishes_count'] == 2
+    assert [response.json()['id'] for response in dish_responses] == [dish1['id'], dish2['id']]
 
     # Delete submenu
-    response = client.delete(f"/{menu['id']}/submenus/{submenu['id']}/")
-    assert response.status_code == 200
-
-    # Views a list of submenus
-    response = client.get(f"/{menu['id']}/submenus/")
-    assert response.status_code == 200
-    assert response.json() == []
-
-    # Views a list of dishes
-    response = client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/")
+    response = await async_client.delete(f"/{menu['id']}/submenus/{submenu['id']}/")
     assert response.status_code == 200
-    assert response.json() == []
 
-    # Views a specific menu
-    response = client.get(f"/{menu['id']}/")
+    # Views a list of submenus, a list of dishes and a specific menu
+    submenus, dishes, response = await asyncio.gather(
+        async_client.get(f"/{menu['id']}/submenus/"),
+        async_client.get(f"/{menu['id']}/submenus/{submenu['id']}/dishes/"),
+        async_client.get(f"/{menu['id']}/"),
+    )
+    assert submenus.status_code == 200
+    assert submenus.json() == []
+    assert dishes.status_code == 200
+    assert dishes.json() == []
     assert response.status_code == 200
     assert response.json()['id'] == menu['id']
     assert response.json()['submenus_count'] == 0
     assert response.json()['dishes_count'] == 0
 
     # Delete menu
-    response = client.delete(f"/{menu['id']}")
+    response = await async_client.delete(f"/{menu['id']}/")
     assert response.status_code == 200
 
     # Views a list of menus
-    response = client.get("/")
+    response = await async_client.get("/")
     assert response.status_code == 200
     assert response.json() == []
+
+
+def test_cache_serves_repeated_reads(client, connection, created_menu, fake_redis):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert [menu["id"] for menu in response.json()] == [MENU_ID]
+    assert list(fake_redis.store) == ["menus:0:get_menus:"]
+
+    # a row inserted behind the API's back does not clear the cache, the second read is the cached one
+    other_menu = {"id": f"{uuid.uuid4()}", "title": "menu2", "description": "menu2"}
+    client.portal.call(partial(seed, connection, menus=[other_menu]))
+    cached = client.get("/")
+    assert cached.status_code == 200
+    assert cached.json() == response.json()
+
+
+@pytest.mark.parametrize("url", [DISHES_URL, DISH_URL])
+def test_cached_dish_price_matches_the_database(client, created_dish, fake_redis, url):
+    response = client.get(url)
+    assert len(fake_redis.store) == 1
+    cached = client.get(url)
+    assert cached.json() == response.json()
+    data = cached.json()
+    dish = data[0] if isinstance(data, list) else data
+    assert dish["price"] == DISH_PRICE_FORMATTED
+
+
+@pytest.mark.parametrize("method, url, body", [
+    pytest.param("POST", "/", {"title": "menu2", "description": "menu2"}, id="create-menu"),
+    pytest.param("PATCH", MENU_URL, {**MENU_BODY, "description": "changed"}, id="update-menu"),
+    pytest.param("DELETE", MENU_URL, None, id="delete-menu"),
+    pytest.param("POST", SUBMENUS_URL, {"title": "submenu2", "description": "submenu2"}, id="create-submenu"),
+    pytest.param("PATCH", SUBMENU_URL, {**SUBMENU_BODY, "description": "changed"}, id="update-submenu"),
+    pytest.param("DELETE", SUBMENU_URL, None, id="delete-submenu"),
+    pytest.param("POST", DISHES_URL, {"title": "dish2", "description": "dish2", "price": "1.50"}, id="create-dish"),
+    pytest.param("PATCH", DISH_URL, {**DISH_BODY, "description": "changed"}, id="update-dish"),
+    pytest.param("DELETE", DISH_URL, None, id="delete-dish"),
+])
+def test_write_invalidates_cache(client, created_dish, fake_redis, method, url, body):
+    for read_url in ("/", MENU_URL, SUBMENUS_URL, SUBMENU_URL, DISHES_URL, DISH_URL):
+        assert client.get(read_url).status_code == 200
+    assert len(fake_redis.store) == 6
+
+    content = orjson.dumps({**body, "id": f"{uuid.uuid4()}"} if method == "POST" else body) if body else None
+    response = client.request(method, url, content=content, headers=JSON_HEADERS)
+    assert response.status_code in (200, 201)
+    assert fake_redis.store["menus:version"] == 1
+
+    # the next read misses the entries cached before the write
+    assert client.get("/").status_code == 200
+    assert "menus:1:get_menus:" in fake_redis.store
+
+
+@pytest.mark.anyio
+async def test_late_cache_fill_is_not_served(fake_redis):
+    reads = []
+
+    @cache.cache(namespace="menus")
+    async def read():
+        reads.append(len(reads))
+        # a write commits and invalidates after this read hit the database, before its result is cached
+        await cache.clear_cache(namespace="menus")
+        return reads[-1]
+
+    assert await read() == 0
+    assert await read() == 1
+
+
+def test_cache_errors_fall_back_to_the_database(client, created_menu, fake_redis):
+    fake_redis.fail = True
+    response = client.get(MENU_URL)
+    assert response.status_code == 200
+    assert response.json()["id"] == MENU_ID
+    response = client.patch(MENU_URL, content=orjson.dumps({**MENU_BODY, "description": "changed"}),
+                            headers=JSON_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["description"] == "changed"